@@ -14,7 +14,7 @@
 # limitations under the License.
 #
 from .akande import Akande
-from .config import OPENAI_API_KEY
+from .config import AKANDE_TTS_PLAYBACK, OPENAI_API_KEY
 from .logger import basic_config
 from .services import OpenAIImpl
 from .utils import validate_api_key
@@ -42,7 +42,9 @@ async def main():
         return
 
     openai_service = OpenAIImpl()
-    akande = Akande(openai_service=openai_service)
+    akande = Akande(
+        openai_service=openai_service, tts_playback=AKANDE_TTS_PLAYBACK
+    )
     try:
         await akande.run_interaction()
     except KeyboardInterrupt:
@@ -50,6 +52,8 @@ async def main():
         # Perform any necessary cleanup tasks here
         # For example, stop the CherryPy server if it's running
         await akande.stop_server()
+    finally:
+        akande.close()
 
 
 if __name__ == "__main__":
@@ -13,23 +13,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import cherrypy
+from .batcher import PromptBatcher
 from .cache import SQLiteCache
-from .config import OPENAI_DEFAULT_MODEL
+from .config import CACHE_DB_PATH, OPENAI_DEFAULT_MODEL
+from .responder import CachedResponder, hash_prompt
 from .services import OpenAIService
 
 from .utils import generate_pdf, generate_csv
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 import asyncio
-import hashlib
 import logging
-import pyttsx4
-import threading
-import speech_recognition as sr
-import os
+
+# cherrypy, pyttsx4 and speech_recognition are imported where they are
+# first used, so a text-only session never pays for loading them
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+# Frames read from the microphone per buffer. Twice the PyAudio default,
+# so fewer reads are issued and samples at buffer boundaries are not
+# dropped while the recognizer is busy.
+MICROPHONE_CHUNK_SIZE = 2048
+
+# Sample rate, in Hz, that recordings are reduced to before upload.
+RECOGNITION_SAMPLE_RATE = 16000
+
+# VT100 sequence moving the cursor home and clearing the screen, written
+# directly rather than spawning the clear command
+_CLEAR = "\x1b[H\x1b[2J"
 
 
 # Define ANSI escape codes for colors
@@ -43,6 +56,45 @@ class Colors:
     ORANGE_BACKGROUND = "\033[48;2;150;61;0m"
 
 
+def _build_banner() -> str:
+    """Compose the menu shown at the top of each interaction loop."""
+    banner_text = "Àkàndé Voice Assistant"
+    banner_width = len(banner_text) + 4
+    lines = [
+        f"{Colors.RESET}{' ' * banner_width}",
+        "  " + banner_text + "  ",
+        " " * banner_width + Colors.RESET,
+    ]
+
+    options = [
+        ("1. Use voice", Colors.BLUE_BACKGROUND),
+        ("2. Ask a question", Colors.GREEN_BACKGROUND),
+        ("3. Start server", Colors.ORANGE_BACKGROUND),
+        ("4. Stop", Colors.RED_BACKGROUND),
+    ]
+
+    for option_text, color in options:
+        lines.append(f"{color}{' ' * banner_width}{Colors.RESET}")
+        lines.append(
+            f"{color}{option_text:<{banner_width}}{Colors.RESET}"
+        )
+        lines.append(f"{color}{' ' * banner_width}{Colors.RESET}")
+    return "\n".join(lines)
+
+
+# The menu never changes, so it is composed once at import time
+_BANNER = _build_banner()
+
+# Spoken when speech recognition fails
+_NOT_UNDERSTOOD_MESSAGE = (
+    "I'm sorry, I couldn't understand what you said."
+)
+_RECOGNITION_ERROR_MESSAGE = (
+    "I'm sorry, I encountered an error with the speech recognition "
+    "service."
+)
+
+
 class Akande:
     """
     The Akande voice assistant.
@@ -52,38 +104,93 @@ class Akande:
     leveraging OpenAI's GPT models for generating responses.
     """
 
-    def __init__(self, openai_service: OpenAIService):
+    def __init__(
+        self, openai_service: OpenAIService, tts_playback: bool = True
+    ):
         """
         Initialize the voice assistant with necessary services and settings.
 
         Args:
             openai_service (OpenAIService): The OpenAI service for
             generating responses.
+            tts_playback (bool): Whether responses are played aloud as
+            well as saved as WAV files.
         """
         # Initialize the CherryPy server attribute
         self.server = None
-        self.server_thread = None
         self.server_running = False
 
-        # Create a directory path with the current date
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        directory_path = Path(date_str)
-        # Ensure the directory exists
-        directory_path.mkdir(parents=True, exist_ok=True)
+        # Ensure the cache directory exists
+        CACHE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-        # Create the WAV filename with timestamp
-        filename = (
-            datetime.now().strftime("%Y-%m-%d-%H-%M-Akande_Cache")
-            + ".db"
+        self.openai_service = openai_service
+        # The interaction loop asks one question at a time, so there is
+        # never a second prompt to coalesce with: a batch of one is
+        # dispatched at once instead of waiting out the queue time
+        self.batcher = PromptBatcher(
+            openai_service, OPENAI_DEFAULT_MODEL, max_batch_size=1
+        )
+        self._recognizer = None
+        # The microphone stream is opened on first use and then kept
+        # open, as negotiating the audio device takes tens of
+        # milliseconds on every turn.
+        self._microphone = None
+        self._microphone_source = None
+        self.cache = SQLiteCache(CACHE_DB_PATH)
+        self.responder = CachedResponder(
+            self.cache, openai_service, self.batcher
         )
-        file_path = directory_path / filename
 
-        self.openai_service = openai_service
-        self.recognizer = sr.Recognizer()
-        self.cache = SQLiteCache(file_path)
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # The text-to-speech engine is created once and reused, as
+        # initialising it loads the platform driver and its voices. The
+        # SAPI5 and NSSpeechSynthesizer drivers only work on the thread
+        # that created them, so the engine lives on a thread of its own.
+        self._tts_engine = None
+        self._tts_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="akande-tts"
+        )
+        self._tts_playback = tts_playback
+
+        # The dated directory that spoken responses are saved to
+        self._today_dir: Optional[Path] = None
+        self._today_str: Optional[str] = None
+
+    def _get_tts_engine(self):
+        """
+        Return the shared pyttsx4 engine, initialising it on first use.
 
-    def hash_prompt(self, prompt: str) -> str:
+        Must only be called on the text-to-speech executor's thread.
+        """
+        if self._tts_engine is None:
+            import pyttsx4
+
+            self._tts_engine = pyttsx4.init()
+            self._tts_engine.setProperty("rate", 161)
+        return self._tts_engine
+
+    def _ensure_today_dir(self, now: datetime) -> Path:
+        """
+        Return the output directory for the given day, creating it once.
+
+        The directory is remembered, so the filesystem is only touched
+        again when the date rolls over.
+
+        Args:
+            now (datetime): The current date and time.
+
+        Returns:
+            Path: The directory named after the date (%Y-%m-%d).
+        """
+        today = now.strftime("%Y-%m-%d")
+        if today != self._today_str:
+            directory_path = Path(today)
+            directory_path.mkdir(parents=True, exist_ok=True)
+            self._today_dir = directory_path
+            self._today_str = today
+        return self._today_dir
+
+    @staticmethod
+    def hash_prompt(prompt: str) -> str:
         """
         Hash the prompt for caching.
 
@@ -94,15 +201,15 @@ class Akande:
             str: The hashed prompt.
 
         """
-        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hash_prompt(prompt)
 
     async def speak(self, text: str) -> None:
         """
         Speak the given text using pyttsx3 in an asynchronous manner.
 
-        This method utilizes a ThreadPoolExecutor to run pyttsx3's blocking
-        operations in a separate thread, allowing the asyncio event loop to
-        remain responsive.
+        This method runs pyttsx3's blocking operations on a dedicated
+        text-to-speech thread, allowing the asyncio event loop to remain
+        responsive.
 
         Args:
             text (str): The text to be spoken.
@@ -115,9 +222,11 @@ class Akande:
             """
             Generates a WAV file from the given text using pyttsx3.
 
-            This function initializes a text-to-speech engine, sets its
-            properties, and saves the spoken text as a WAV file in a directory
-            named with the current date (%Y-%m-%d).
+            This function reuses the shared text-to-speech engine and saves
+            the spoken text as a WAV file in a directory named with the
+            current date (%Y-%m-%d), alongside the PDF and CSV copies of
+            the response. The text is also played aloud unless playback
+            is disabled.
 
             The filename is timestamped to ensure uniqueness.
 
@@ -128,22 +237,18 @@ class Akande:
             Exception: If an error occurs during speech synthesis, it is
             raised as an exception.
             """
-            # Create a directory path with the current date
-            date_str = datetime.now().strftime("%Y-%m-%d")
-            directory_path = Path(date_str)
-            # Ensure the directory exists
-            directory_path.mkdir(parents=True, exist_ok=True)
+            now = datetime.now()
+            directory_path = self._ensure_today_dir(now)
 
             # Create the WAV filename with timestamp
-            filename = (
-                datetime.now().strftime("%Y-%m-%d-%H-%M-Akande")
-                + ".wav"
-            )
+            filename = now.strftime("%Y-%m-%d-%H-%M-Akande") + ".wav"
             file_path = directory_path / filename
             try:
-                engine = pyttsx4.init()
-                engine.setProperty("rate", 161)
-                engine.say(text)
+                engine = self._get_tts_engine()
+                # Playback is a second synthesis pass on top of the WAV
+                # file, so it is skipped when only the file is wanted
+                if self._tts_playback:
+                    engine.say(text)
                 engine.save_to_file(text, str(file_path))
                 engine.runAndWait()
                 logging.info(f"WAV file generated: {file_path}")
@@ -151,58 +256,116 @@ class Akande:
                 logging.error(
                     f"Error using pyttsx3 for speech synthesis: {e}"
                 )
+                # Drop an engine that may be wedged so the next call
+                # starts from a fresh one
+                self._tts_engine = None
+
+        # Always the same thread, which also serialises calls into the
+        # engine, as the drivers are not reentrant
+        await asyncio.get_running_loop().run_in_executor(
+            self._tts_executor, tts_engine_run, text
+        )
+
+    @property
+    def recognizer(self) -> "sr.Recognizer":
+        """The speech recognizer, created on first use."""
+        if self._recognizer is None:
+            import speech_recognition as sr
+
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
 
-        await asyncio.get_event_loop().run_in_executor(
-            self.executor, partial(tts_engine_run, text)
+    def _get_microphone_source(self) -> "sr.AudioSource":
+        """Return the open microphone stream, opening it on first use."""
+        if self._microphone_source is None:
+            import speech_recognition as sr
+
+            microphone = sr.Microphone(chunk_size=MICROPHONE_CHUNK_SIZE)
+            self._microphone_source = microphone.__enter__()
+            # Only kept once the stream is open, so close() never exits
+            # a microphone whose stream failed to open
+            self._microphone = microphone
+        return self._microphone_source
+
+    def _record(self) -> "Optional[sr.AudioData]":
+        """
+        Record a phrase from the microphone, blocking until it ends.
+
+        Returns:
+            Optional[sr.AudioData]: The phrase, downsampled for
+            recognition, or None if it holds no speech.
+        """
+        # audioop is deprecated and gone from 3.13's standard library,
+        # so only voice sessions import it
+        from .vad import contains_speech
+
+        source = self._get_microphone_source()
+        logging.info("Listening for user input...")
+        audio = self.recognizer.listen(source)
+        # Silence and short noise never reach the recognition service
+        if not contains_speech(
+            audio.frame_data,
+            audio.sample_rate,
+            audio.sample_width,
+            self.recognizer.energy_threshold,
+        ):
+            logging.info("No speech detected in recording.")
+            return None
+        if audio.sample_rate <= RECOGNITION_SAMPLE_RATE:
+            return audio
+        import speech_recognition as sr
+
+        # Speech recognition gains nothing above 16 kHz, so the upload
+        # is cut to a third of a 48 kHz recording
+        return sr.AudioData(
+            audio.get_raw_data(convert_rate=RECOGNITION_SAMPLE_RATE),
+            RECOGNITION_SAMPLE_RATE,
+            audio.sample_width,
         )
 
+    def close(self) -> None:
+        """
+        Close the microphone stream if it was opened, and stop the
+        text-to-speech thread once any pending speech has finished.
+        """
+        if self._microphone is not None:
+            self._microphone.__exit__(None, None, None)
+            self._microphone = None
+            self._microphone_source = None
+        self._tts_executor.shutdown(wait=True)
+
     async def listen(self) -> str:
-        """Listen for user input and return the recognized text."""
+        """
+        Listen for user input and return the recognized text.
+
+        Recording and recognition both block (on the microphone and on the
+        recognition service), so they run in the default executor to keep
+        the event loop free for other tasks.
+        """
+        import speech_recognition as sr
+
+        loop = asyncio.get_running_loop()
         try:
-            with sr.Microphone() as source:
-                logging.info("Listening for user input...")
-                audio = self.recognizer.listen(source)
-            return self.recognizer.recognize_google(audio)
-        except sr.UnknownValueError:
-            await self.speak(
-                "I'm sorry, I couldn't understand what you said."
+            audio = await loop.run_in_executor(None, self._record)
+            if audio is None:
+                return ""
+            return await loop.run_in_executor(
+                None, self.recognizer.recognize_google, audio
             )
+        except sr.UnknownValueError:
+            await self.speak(_NOT_UNDERSTOOD_MESSAGE)
             return ""
         except sr.RequestError as e:
             logging.error(f"Speech recognition service error {e}")
-            await self.speak(
-                """
-                I'm sorry, I encountered an error with the speech recognition
-                service.
-                """
-            )
+            await self.speak(_RECOGNITION_ERROR_MESSAGE)
             return ""
 
     async def run_interaction(self) -> None:
         """Main interaction loop of the voice assistant."""
         while True:
-            os.system(
-                "clear"
-            )  # Clear the console for better visualization
-            banner_text = "Àkàndé Voice Assistant"
-            banner_width = len(banner_text) + 4
-            print(f"{Colors.RESET}{' ' * banner_width}")
-            print("  " + banner_text + "  ")
-            print(" " * banner_width + Colors.RESET)
-
-            options = [
-                ("1. Use voice", Colors.BLUE_BACKGROUND),
-                ("2. Ask a question", Colors.GREEN_BACKGROUND),
-                ("3. Start server", Colors.ORANGE_BACKGROUND),
-                ("4. Stop", Colors.RED_BACKGROUND),
-            ]
-
-            for option_text, color in options:
-                print(f"{color}{' ' * banner_width}{Colors.RESET}")
-                print(
-                    f"{color}{option_text:<{banner_width}}{Colors.RESET}"
-                )
-                print(f"{color}{' ' * banner_width}{Colors.RESET}")
+            # Clear the console for better visualization
+            print(_CLEAR, end="", flush=True)
+            print(_BANNER)
 
             choice = input("\nPlease select an option: ").strip()
 
@@ -217,9 +380,7 @@ class Akande:
                 if question:
                     print("Processing question...")
                     response = await self.generate_response(question)
-                    await self.speak(response)
-                    await generate_pdf(question, response)
-                    await generate_csv(question, response)
+                    await self.deliver_response(question, response)
                 else:
                     print("No question provided.")
             elif choice == "1":
@@ -232,41 +393,79 @@ class Akande:
                 elif prompt:
                     print("Processing voice command...")
                     response = await self.generate_response(prompt)
-                    await self.speak(response)
-                    await generate_pdf(prompt, response)
-                    await generate_csv(prompt, response)
+                    await self.deliver_response(prompt, response)
                 else:
                     print("No voice command detected.")
             else:
                 print("Invalid choice. Please select a valid option.")
 
+    async def deliver_response(
+        self, prompt: str, response: str
+    ) -> None:
+        """
+        Speak a response while saving it as PDF and CSV documents.
+
+        The three outputs are independent, so they run concurrently.
+
+        Args:
+            prompt (str): The prompt that produced the response.
+            response (str): The generated response.
+        """
+        await asyncio.gather(
+            self.speak(response),
+            generate_pdf(prompt, response),
+            generate_csv(prompt, response),
+        )
+
     async def run_server(self) -> None:
-        """Run the CherryPy server in a separate thread."""
+        """
+        Start the CherryPy server alongside the interaction loop.
 
-        # Define a function to start the server
-        def start_server():
-            from .server.server import AkandeServer
+        The application is mounted on CherryPy's tree and the engine is
+        started in the background; it serves requests from its own
+        worker threads, so no thread of ours is needed.
+        """
+        if self.server_running:
+            logging.info("CherryPy server is already running.")
+            return
 
-            cherrypy.quickstart(AkandeServer())
+        import cherrypy
 
-            # Set server_running flag to True
-            self.server_running = True
+        from .server.server import SERVER_CONFIG, AkandeServer
 
-        # Start the server in a separate thread
-        server_thread = threading.Thread(target=start_server)
-        server_thread.start()
+        # The server shares this session's cache rather than opening a
+        # second SQLiteCache on the same database
+        cherrypy.tree.mount(
+            AkandeServer(cache=self.cache), "/", config=SERVER_CONFIG
+        )
+        # The autoreloader polls every module file for changes
+        cherrypy.config.update({"engine.autoreload.on": False})
+        # Starting binds the listening socket, which may wait on the port
+        await asyncio.get_running_loop().run_in_executor(
+            None, cherrypy.engine.start
+        )
+        self.server_running = True
         logging.info("CherryPy server started.")
 
     async def stop_server(self) -> None:
         """Stop the CherryPy server."""
+        if not self.server_running:
+            return
+        import cherrypy
+
         self.server_running = False
-        cherrypy.engine.exit()
+        await asyncio.get_running_loop().run_in_executor(
+            None, cherrypy.engine.exit
+        )
         logging.info("CherryPy server stopped.")
 
     async def generate_response(self, prompt: str) -> str:
         """
         Generate a response using the OpenAI service or cache.
 
+        Exact and paraphrased repeats of earlier prompts are answered
+        from the cache; see CachedResponder.
+
         Args:
             prompt (str): The prompt for generating the response.
 
@@ -274,21 +473,4 @@ class Akande:
             str: The generated response.
 
         """
-        prompt_hash = self.hash_prompt(prompt)
-        cached_response = self.cache.get(prompt_hash)
-        if cached_response:
-            logging.info(f"Cache hit for prompt: {prompt}")
-            return cached_response
-        else:
-            logging.info(f"Cache miss for prompt: {prompt}")
-            response = await self.openai_service.generate_response(
-                prompt, OPENAI_DEFAULT_MODEL, {}
-            )
-            # Correctly access response attributes for Pydantic models
-            text_response = (
-                response.choices[0].message.content.strip()
-                if response.choices
-                else ""
-            )
-            self.cache.set(prompt_hash, text_response)
-            return text_response
+        return await self.responder.respond(prompt)
@@ -0,0 +1,128 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from .services import OpenAIService
+
+
+class PromptBatcher:
+    """
+    Coalesce concurrent prompts into batches for the OpenAI service.
+
+    Prompts submitted within ``max_queue_time`` of each other are
+    collected, up to ``max_batch_size``, and dispatched together:
+    identical prompts share a single API call and distinct prompts are
+    sent concurrently over the service's shared connection pool.
+
+    Parameters
+    ----------
+    openai_service : OpenAIService
+        The service used to generate responses.
+    model : str
+        The model passed to the service for every prompt.
+    params : dict, optional
+        Extra parameters passed to the service for every prompt.
+    max_batch_size : int, optional
+        The number of queued prompts that triggers an immediate flush.
+    max_queue_time : float, optional
+        The longest time, in seconds, a prompt waits for a batch.
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        model: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_batch_size: int = 16,
+        max_queue_time: float = 0.05,
+    ):
+        self.openai_service = openai_service
+        self.model = model
+        self.params = params or {}
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def process(self, prompt: str) -> Any:
+        """
+        Queue a prompt and wait for its response.
+
+        Parameters
+        ----------
+        prompt : str
+            The prompt to generate a response for.
+
+        Returns
+        -------
+        Any
+            The response returned by the OpenAI service.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                self.max_queue_time, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        """Dispatch every queued prompt as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._process_batch(batch))
+            # Keep a reference so the task is not garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process_batch(
+        self, batch: List[Tuple[str, asyncio.Future]]
+    ) -> None:
+        """Send each distinct prompt once and fan the results out."""
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for prompt, future in batch:
+            waiters.setdefault(prompt, []).append(future)
+        prompts = list(waiters)
+        logging.info(
+            f"Dispatching batch of {len(batch)} prompts "
+            f"({len(prompts)} distinct)."
+        )
+        results = await asyncio.gather(
+            *(
+                self.openai_service.generate_response(
+                    prompt, self.model, self.params
+                )
+                for prompt in prompts
+            ),
+            return_exceptions=True,
+        )
+        for prompt, result in zip(prompts, results):
+            for future in waiters[prompt]:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -13,13 +13,70 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Sequence, Set, Tuple
+import asyncio
 import logging
+import operator
 import sqlite3
 import threading
 import time
-import json
+
+# Statements on the cache hot path. sqlite3 caches prepared statements
+# per connection keyed by SQL text, so each is written exactly once here.
+_SELECT_SQL = """
+    SELECT response
+    FROM cache
+    WHERE prompt_hash = ?
+    AND timestamp > ?
+"""
+
+_UPDATE_SQL = """
+    UPDATE cache
+    SET response = ?,
+        timestamp = CURRENT_TIMESTAMP,
+        last_access = CURRENT_TIMESTAMP
+    WHERE prompt_hash = ?
+"""
+
+_INSERT_SQL = """
+    INSERT INTO cache (prompt_hash, response)
+    VALUES (?, ?)
+"""
+
+_EVICT_SQL = """
+    DELETE FROM cache
+    WHERE rowid IN (
+        SELECT rowid
+        FROM cache
+        ORDER BY last_access ASC, rowid ASC
+        LIMIT ?
+    )
+"""
+
+_UPSERT_VEC_SQL = """
+    INSERT OR REPLACE INTO cache_vec (prompt_hash, embedding)
+    VALUES (?, ?)
+"""
+
+_SELECT_VEC_SQL = """
+    SELECT cache.prompt_hash, cache.response, cache_vec.embedding
+    FROM cache_vec
+    JOIN cache ON cache.prompt_hash = cache_vec.prompt_hash
+    WHERE cache.timestamp > ?
+"""
+
+_TOUCH_SQL = """
+    UPDATE cache
+    SET last_access = CURRENT_TIMESTAMP
+    WHERE prompt_hash = ?
+"""
+
+# Bumped whenever the table layout changes. The cache only holds
+# regenerable responses, so an outdated table is dropped, not migrated.
+_SCHEMA_VERSION = 3
 
 
 class SQLiteCache:
@@ -35,6 +92,10 @@ class SQLiteCache:
     expiration : timedelta, optional
         The duration after which an item expires from the cache,
         represented as a timedelta object.
+    memory_size : int, optional
+        The number of recently used responses also kept in process.
+    memory_ttl : float, optional
+        The number of seconds a response stays valid in process.
 
     Attributes
     ----------
@@ -46,7 +107,7 @@ class SQLiteCache:
         The duration after which an item expires from the cache,
         represented as a timedelta object.
     lock : threading.Lock
-        A lock for thread-safe access to the cache.
+        A lock serialising writes to the cache.
     """
 
     def __init__(
@@ -54,30 +115,113 @@ class SQLiteCache:
         db_path: str,
         max_size: int = 1000,
         expiration: timedelta = timedelta(days=7),
+        memory_size: int = 512,
+        memory_ttl: float = 600.0,
     ):
         self.db_path = db_path
         self.max_size = max_size
         self.expiration = expiration
+        self.memory_size = memory_size
+        self.memory_ttl = memory_ttl
         self.lock = threading.Lock()
+        self._local = threading.local()
+        # Hashes read since the last write, whose last_access is bumped
+        # just before the next insert, the only time eviction runs.
+        # Readers run on many threads, so the set has a lock of its own.
+        self._touched: Set[str] = set()
+        self._touched_lock = threading.Lock()
+        # Rows in the table, maintained by set() so eviction only counts
+        # the table again after another connection has written to it
+        self._count = 0
+        # Hot responses served without touching SQLite, as
+        # prompt_hash -> (time stored, response) in LRU order
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = (
+            OrderedDict()
+        )
+        self._memory_lock = threading.Lock()
         self.initialize_cache()
 
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection to the SQLite database.
+
+        Each thread opens its connection once, in autocommit mode, and
+        reuses it. The database runs in WAL mode so readers proceed
+        alongside the single writer.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            # Lets evicted responses take their embeddings with them
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
     def initialize_cache(self):
         """
         Initialize the cache by creating the underlying SQLite database table,
         if it does not already exist.
         """
-        with self.lock, sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        with self.lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != _SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS cache_vec")
+                conn.execute("DROP TABLE IF EXISTS cache")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS cache (
                     prompt_hash TEXT PRIMARY KEY,
                     response TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_access DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_last_access
+                ON cache(last_access)
+                """
+            )
+            # Prompt embeddings for the semantic lookup, stored as
+            # packed float32 arrays
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_vec (
+                    prompt_hash TEXT PRIMARY KEY
+                        REFERENCES cache (prompt_hash)
+                        ON DELETE CASCADE,
+                    embedding BLOB
                 )
                 """
             )
-            conn.commit()
+
+    def _row_count(self, conn: sqlite3.Connection) -> int:
+        """
+        Return the number of rows in the table.
+
+        Must be called inside a write transaction. The table is only
+        counted again when another connection, such as another process
+        sharing the database, has committed since this connection last
+        counted it; otherwise the count kept by set() is exact.
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != getattr(self._local, "data_version", None):
+            self._count = conn.execute(
+                "SELECT COUNT(*) FROM cache"
+            ).fetchone()[0]
+            self._local.data_version = version
+        return self._count
 
     def get(self, prompt_hash: str) -> Optional[str]:
         """
@@ -94,19 +238,20 @@ class SQLiteCache:
             The cached response, if available, or None if the response is not
             in the cache or has expired.
         """
-        start_time = time.time()
-        with self.lock, sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT response
-                FROM cache
-                WHERE prompt_hash = ?
-                AND timestamp > ?
-                """,
-                (prompt_hash, datetime.now() - self.expiration),
-            )
-            result = cursor.fetchone()
+        response = self._memory_get(prompt_hash)
+        if response is not None:
+            return response
+        # Timing is skipped entirely when nothing would be logged
+        log_access = logging.root.isEnabledFor(logging.INFO)
+        if log_access:
+            start_time = time.time()
+        # WAL readers never block on the writer, so no lock is taken
+        cursor = self._connection().cursor()
+        cursor.execute(
+            _SELECT_SQL, (prompt_hash, datetime.now() - self.expiration)
+        )
+        result = cursor.fetchone()
+        if log_access:
             hit_miss = "hit" if result else "miss"
             latency = (
                 time.time() - start_time
@@ -115,12 +260,71 @@ class SQLiteCache:
                 f"Cache {hit_miss} for {prompt_hash}. "
                 f"Access latency: {latency:.2f} ms."
             )
-            if result:
-                # Deserialize the response back into a Python object
-                return json.loads(result[0])
-            return None
+        if result:
+            self._touch(prompt_hash)
+            response = result[0]
+            self._memory_set(prompt_hash, response)
+            return response
+        return None
 
-    def set(self, prompt_hash: str, response: any):
+    def _touch(self, prompt_hash: str) -> None:
+        """Record a read for the SQLite eviction order."""
+        with self._touched_lock:
+            self._touched.add(prompt_hash)
+
+    def _memory_get(self, prompt_hash: str) -> Optional[str]:
+        """
+        Retrieve a response from the in-process cache.
+
+        A hit still counts as an access for the SQLite eviction order.
+
+        Parameters
+        ----------
+        prompt_hash : str
+            The hash of the code completion prompt.
+
+        Returns
+        -------
+        Optional[str]
+            The cached response, or None if it is not held in process
+            or is older than ``memory_ttl``.
+        """
+        with self._memory_lock:
+            entry = self._memory.get(prompt_hash)
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if time.monotonic() - stored_at >= self.memory_ttl:
+                del self._memory[prompt_hash]
+                return None
+            self._memory.move_to_end(prompt_hash)
+        self._touch(prompt_hash)
+        return response
+
+    def _memory_set(self, prompt_hash: str, response: str) -> None:
+        """
+        Store a response in the in-process cache, evicting the least
+        recently used entry once ``memory_size`` is exceeded.
+
+        Parameters
+        ----------
+        prompt_hash : str
+            The hash of the code completion prompt.
+        response : str
+            The response to store.
+        """
+        with self._memory_lock:
+            self._memory[prompt_hash] = (time.monotonic(), response)
+            self._memory.move_to_end(prompt_hash)
+            if len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def set(
+        self,
+        prompt_hash: str,
+        response: str,
+        embedding: Optional[Sequence[float]] = None,
+    ):
         """
         Store a response in the cache.
 
@@ -128,31 +332,173 @@ class SQLiteCache:
         ----------
         prompt_hash : str
             The hash of the code completion prompt.
-        response : any
-            The response to store in the cache.
-        """
-        # Serialize the response object to a JSON string
-        serialized_response = json.dumps(response)
-        with self.lock, sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """REPLACE INTO cache (
-                    prompt_hash,
-                    response,
-                    timestamp
-                ) VALUES (?, ?, CURRENT_TIMESTAMP)""",
-                (prompt_hash, serialized_response),
-            )
-            cursor.execute(
-                """
-                DELETE FROM cache
-                WHERE timestamp <= (
-                    SELECT timestamp
-                    FROM cache
-                    ORDER BY timestamp DESC
-                    LIMIT 1 OFFSET ?
-                )
-                """,
-                (self.max_size - 1,),
+        response : str
+            The response to store in the cache, as plain text.
+        embedding : Sequence[float], optional
+            The unit-length embedding of the prompt, which makes the
+            response available to semantic_get.
+        """
+        with self.lock:
+            conn = self._connection()
+            with self._touched_lock:
+                touched, self._touched = list(self._touched), set()
+            # One write transaction, so the whole update commits (and
+            # syncs the WAL) once rather than once per statement
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._row_count(conn)
+                conn.executemany(_TOUCH_SQL, [(h,) for h in touched])
+                updated = conn.execute(
+                    _UPDATE_SQL, (response, prompt_hash)
+                ).rowcount
+                if not updated:
+                    conn.execute(
+                        _INSERT_SQL, (prompt_hash, response)
+                    )
+                    count += 1
+                    if count > self.max_size:
+                        count -= conn.execute(
+                            _EVICT_SQL, (count - self.max_size,)
+                        ).rowcount
+                if embedding is not None:
+                    conn.execute(
+                        _UPSERT_VEC_SQL,
+                        (prompt_hash, array("f", embedding).tobytes()),
+                    )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self._count = count
+        self._memory_set(prompt_hash, response)
+
+    def semantic_get(
+        self, embedding: Sequence[float], threshold: float
+    ) -> Optional[str]:
+        """
+        Retrieve the response to the most similar cached prompt.
+
+        The cache holds at most ``max_size`` short vectors, so an exact
+        scan is cheap enough and needs no vector index.
+
+        Parameters
+        ----------
+        embedding : Sequence[float]
+            The unit-length embedding of the prompt.
+        threshold : float
+            The minimum cosine similarity for a cached prompt to match.
+
+        Returns
+        -------
+        Optional[str]
+            The cached response, or None if no unexpired prompt is
+            similar enough.
+        """
+        log_access = logging.root.isEnabledFor(logging.INFO)
+        if log_access:
+            start_time = time.time()
+        query = array("f", embedding)
+        best_score = threshold
+        best = None
+        cursor = self._connection().execute(
+            _SELECT_VEC_SQL, (datetime.now() - self.expiration,)
+        )
+        for prompt_hash, response, blob in cursor:
+            vector = array("f")
+            vector.frombytes(blob)
+            if len(vector) != len(query):
+                continue
+            # Both vectors are unit length, so this is their cosine
+            score = sum(map(operator.mul, query, vector))
+            if score >= best_score:
+                best_score = score
+                best = (prompt_hash, response)
+        if log_access:
+            latency = (time.time() - start_time) * 1000
+            hit_miss = "hit" if best else "miss"
+            logging.info(
+                f"Semantic cache {hit_miss} "
+                f"(similarity {best_score:.3f}). "
+                f"Lookup latency: {latency:.2f} ms."
             )
-            conn.commit()
+        if best is None:
+            return None
+        self._touch(best[0])
+        return best[1]
+
+    async def aget(self, prompt_hash: str) -> Optional[str]:
+        """
+        Retrieve a response from the cache without blocking the event loop.
+
+        The SQLite read, when the response is not held in process, runs in
+        the loop's default executor.
+
+        Parameters
+        ----------
+        prompt_hash : str
+            The hash of the code completion prompt.
+
+        Returns
+        -------
+        Optional[str]
+            The cached response, if available, or None if the response is not
+            in the cache or has expired.
+        """
+        # Responses held in process are returned without an executor hop
+        response = self._memory_get(prompt_hash)
+        if response is not None:
+            return response
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get, prompt_hash)
+
+    async def aset(
+        self,
+        prompt_hash: str,
+        response: str,
+        embedding: Optional[Sequence[float]] = None,
+    ):
+        """
+        Store a response in the cache without blocking the event loop.
+
+        The SQLite write runs in the loop's default executor.
+
+        Parameters
+        ----------
+        prompt_hash : str
+            The hash of the code completion prompt.
+        response : str
+            The response to store in the cache, as plain text.
+        embedding : Sequence[float], optional
+            The unit-length embedding of the prompt.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, self.set, prompt_hash, response, embedding
+        )
+
+    async def asemantic_get(
+        self, embedding: Sequence[float], threshold: float
+    ) -> Optional[str]:
+        """
+        Retrieve the response to the most similar cached prompt without
+        blocking the event loop.
+
+        The scan runs in the loop's default executor.
+
+        Parameters
+        ----------
+        embedding : Sequence[float]
+            The unit-length embedding of the prompt.
+        threshold : float
+            The minimum cosine similarity for a cached prompt to match.
+
+        Returns
+        -------
+        Optional[str]
+            The cached response, or None if no unexpired prompt is
+            similar enough.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.semantic_get, embedding, threshold
+        )
@@ -14,18 +14,98 @@
 # limitations under the License.
 #
 import os
+from pathlib import Path
+from typing import Final, Optional
 from dotenv import load_dotenv
 
 # Loads environment variables from a .env file into the environment.
 load_dotenv()
 
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Read an on/off switch, such as "true" or "0", from the env."""
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value not in ("0", "false", "no", "off")
+
+
 # Configuration
 
 # Number of seconds allowed per API call before timing out.
-API_CALL_TIMEOUT = 90
+API_CALL_TIMEOUT: Final[int] = 90
+
+# Initial number of OpenAI API calls allowed in flight at once. The limit
+# adapts to observed latency between 1 and four times this value.
+OPENAI_MAX_CONCURRENT: Final[int] = 8
+
+# Rolling mean OpenAI API latency, in seconds, considered healthy.
+OPENAI_TARGET_LATENCY: Final[float] = 10.0
+
+# Number of times a failed OpenAI API call is retried by the client.
+OPENAI_MAX_RETRIES: Final[int] = 5
+
+# Number of seconds an idle connection to the OpenAI API is kept open.
+OPENAI_KEEPALIVE_EXPIRY: Final[float] = 30.0
+
+# Requests and tokens per minute allowed by the OpenAI account tier.
+OPENAI_RATE_LIMIT_RPM: Final[int] = int(
+    os.getenv("OPENAI_RATE_LIMIT_RPM", "500")
+)
+OPENAI_RATE_LIMIT_TPM: Final[int] = int(
+    os.getenv("OPENAI_RATE_LIMIT_TPM", "60000")
+)
 
 # Gets OpenAI API key from the environment variables loaded by load_dotenv().
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# A missing key is reported by the entry point, which validates it once.
+OPENAI_API_KEY: Final[Optional[str]] = os.getenv("OPENAI_API_KEY")
+
+# Gets the name of default OpenAI model to use from the environment
+# variables, falling back to a chat model rather than passing None on to
+# every request.
+OPENAI_DEFAULT_MODEL: Final[str] = (
+    os.getenv("OPENAI_DEFAULT_MODEL") or "gpt-4o-mini"
+)
+
+# Model and vector size used to embed prompts for the semantic cache.
+# The API shortens the vectors and keeps them unit length.
+OPENAI_EMBEDDING_MODEL: Final[str] = os.getenv(
+    "OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"
+)
+OPENAI_EMBEDDING_DIMENSIONS: Final[int] = 256
+
+# Whether prompts missing from the cache are matched against cached
+# prompts by embedding similarity. Off by default: it puts an embeddings
+# round trip in front of every uncached question, and a close match is
+# not always the same question.
+SEMANTIC_CACHE_ENABLED: Final[bool] = _env_flag(
+    "AKANDE_SEMANTIC_CACHE", False
+)
+
+# Cosine similarity above which a cached response to a different prompt
+# is reused as the response to a new one. Paraphrases and merely
+# related questions can both score around 0.9, so the default errs high:
+# a missed paraphrase only costs a completion, a false match answers the
+# wrong question.
+SEMANTIC_CACHE_THRESHOLD: Final[float] = float(
+    os.getenv("AKANDE_SEMANTIC_CACHE_THRESHOLD", "0.95")
+)
+
+# Whether spoken responses are played aloud as well as saved as WAV
+# files. Playback synthesises every response a second time, so it can be
+# turned off where only the files are wanted.
+AKANDE_TTS_PLAYBACK: Final[bool] = _env_flag(
+    "AKANDE_TTS_PLAYBACK", True
+)
 
-# Gets the name of default OpenAI model to use from the environment variables
-OPENAI_DEFAULT_MODEL = os.getenv("OPENAI_DEFAULT_MODEL")
+# Path of the response cache database. It lives at a stable location, not
+# in the dated output directory, so cached responses survive restarts.
+CACHE_DB_PATH: Final[Path] = Path(
+    os.getenv(
+        "AKANDE_CACHE_DB",
+        Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache"))
+        / "akande"
+        / "cache.db",
+    )
+)
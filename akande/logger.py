@@ -13,18 +13,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from logging.handlers import QueueHandler, QueueListener
+import atexit
 import logging
+import queue
 
 
 def basic_config(filename: str, level: int, log_format: str) -> None:
     """
     This function sets up the logging configuration for the application.
 
+    Records are put on an in-memory queue and written to the file by a
+    background listener thread, so logging calls on hot paths never wait
+    on disk I/O. The listener flushes the queue when the interpreter
+    exits.
+
     :param filename: The name of the log file.
     :param level: The logging level.
     :param log_format: The format of the log messages.
     :return: None
     """
-    logging.basicConfig(
-        filename=filename, level=level, format=log_format
-    )
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter(log_format))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
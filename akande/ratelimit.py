@@ -0,0 +1,264 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import deque
+from typing import Deque, Mapping, Optional, Tuple
+import asyncio
+import logging
+import math
+import re
+import time
+
+# Matches the components of durations such as "6m0s", "1.5s" or "20ms"
+# reported in OpenAI's x-ratelimit-reset-* headers.
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Convert an OpenAI rate-limit reset duration to seconds.
+
+    Parameters
+    ----------
+    value : str
+        A duration such as "6m0s", "1.5s" or "20ms".
+
+    Returns
+    -------
+    float
+        The duration in seconds, or 0.0 if it could not be parsed.
+    """
+    return sum(
+        float(amount) * _DURATION_UNITS[unit]
+        for amount, unit in _DURATION_PART.findall(value)
+    )
+
+
+class RateLimiter:
+    """
+    A limiter for requests and tokens per minute.
+
+    Requests draw from a token bucket refilled continuously at the
+    per-minute rate, so they are admitted at a steady pace rather than
+    in bursts of a whole minute's allowance. The bucket holds one
+    second's worth of requests, mirroring providers that enforce their
+    per-minute limits over shorter periods. Completion tokens, which are
+    only known after a request, are counted over a sliding window.
+
+    Parameters
+    ----------
+    requests_per_minute : int
+        The sustained number of requests admitted per minute.
+    tokens_per_minute : int
+        The maximum number of tokens consumed per window.
+    window : float, optional
+        The length of the sliding token window, in seconds.
+    headroom : float, optional
+        The fraction of the provider's request budget below which
+        requests are spaced out pre-emptively.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        window: float = 60.0,
+        headroom: float = 0.1,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.headroom = headroom
+        self._rate = requests_per_minute / 60.0
+        self._capacity = max(1.0, math.ceil(self._rate))
+        self._bucket = self._capacity
+        self._refilled_at = time.monotonic()
+        self._tok_times: Deque[Tuple[float, int]] = deque()
+        self._tok_total = 0
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Create the lock lazily so it binds to the running loop."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _refill(self, now: float) -> None:
+        """Top the bucket up for the time elapsed since last refill."""
+        self._bucket = min(
+            self._capacity,
+            self._bucket + (now - self._refilled_at) * self._rate,
+        )
+        self._refilled_at = now
+
+    def _evict(self, now: float) -> None:
+        """Drop token entries that have fallen out of the window."""
+        cutoff = now - self.window
+        while self._tok_times and self._tok_times[0][0] <= cutoff:
+            self._tok_total -= self._tok_times.popleft()[1]
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent, then record it."""
+        # Waiters queue on the lock and are admitted in arrival order,
+        # instead of all waking to race for the same slot
+        async with self._get_lock():
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                self._evict(now)
+                delay = self._paused_until - now
+                if self._bucket < 1.0:
+                    delay = max(
+                        delay, (1.0 - self._bucket) / self._rate
+                    )
+                if self._tok_total >= self.tokens_per_minute:
+                    delay = max(
+                        delay, self._tok_times[0][0] + self.window - now
+                    )
+                if delay <= 0:
+                    self._bucket -= 1.0
+                    return
+                await asyncio.sleep(delay)
+
+    def record_tokens(self, tokens: int) -> None:
+        """Account for the tokens consumed by a completed request."""
+        self._tok_times.append((time.monotonic(), tokens))
+        self._tok_total += tokens
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Pre-throttle from the provider's remaining request budget.
+
+        When fewer than ``headroom`` of the requests allowed remain, the
+        next request is delayed so the remainder is spread evenly over
+        the time left until the provider's window resets.
+
+        Parameters
+        ----------
+        headers : Mapping[str, str]
+            The HTTP response headers of an OpenAI API call.
+        """
+        try:
+            limit = int(headers["x-ratelimit-limit-requests"])
+            remaining = int(headers["x-ratelimit-remaining-requests"])
+            reset = headers["x-ratelimit-reset-requests"]
+        except (KeyError, TypeError, ValueError):
+            return
+        if remaining >= limit * self.headroom:
+            return
+        delay = parse_duration(reset) / max(remaining, 1)
+        logging.info(
+            f"{remaining}/{limit} requests remaining, "
+            f"spacing requests by {delay:.2f} s."
+        )
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + delay
+        )
+
+
+class AIMDLimiter:
+    """
+    An adaptive concurrency limit driven by observed latency.
+
+    The number of permits grows additively while the rolling mean
+    latency stays at or under target, and is cut multiplicatively on
+    slow responses or overload errors (AIMD), so concurrency settles
+    near the provider's knee without polling.
+
+    Parameters
+    ----------
+    initial : int
+        The starting number of concurrent permits.
+    minimum : int, optional
+        The floor the permit count is never cut below.
+    maximum : int, optional
+        The ceiling the permit count never grows past.
+    target_latency : float, optional
+        The rolling mean latency, in seconds, considered healthy.
+    increase : float, optional
+        The permits added after each healthy response.
+    decrease : float, optional
+        The factor applied to the permit count on congestion.
+    window : int, optional
+        The number of latency samples in the rolling mean.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 64,
+        target_latency: float = 10.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        window: int = 20,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        """Create the condition lazily so it binds to the running loop."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        """Wait for a free permit under the current limit."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(
+                lambda: self._in_flight < int(self.limit)
+            )
+            self._in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Return a permit and adjust the limit from the call's outcome.
+
+        Parameters
+        ----------
+        latency : float
+            The duration of the call, in seconds.
+        overloaded : bool
+            Whether the call failed with a rate-limit, server error or
+            timeout.
+        """
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            if not overloaded:
+                self._latencies.append(latency)
+                mean = sum(self._latencies) / len(self._latencies)
+                overloaded = mean > self.target_latency
+            if overloaded:
+                self.limit = max(
+                    float(self.minimum), self.limit * self.decrease
+                )
+                # Judge the new limit on fresh samples only
+                self._latencies.clear()
+            else:
+                self.limit = min(
+                    float(self.maximum), self.limit + self.increase
+                )
+            condition.notify_all()
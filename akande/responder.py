@@ -0,0 +1,205 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from typing import AsyncIterator, List, Optional, Tuple
+import functools
+import hashlib
+import logging
+
+from .batcher import PromptBatcher
+from .cache import SQLiteCache
+from .config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD
+from .services import OpenAIService
+
+# Prompts longer than this, in characters, are hashed without memoising
+_HASH_MEMO_MAX_PROMPT = 4096
+
+
+def _hash_prompt(prompt: str) -> str:
+    """Return the 128-bit BLAKE2b hex digest of a normalised prompt."""
+    normalised = " ".join(prompt.split()).lower()
+    return hashlib.blake2b(
+        normalised.encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+_hash_prompt_memoised = functools.lru_cache(maxsize=1024)(_hash_prompt)
+
+
+def hash_prompt(prompt: str) -> str:
+    """
+    Hash a prompt into its response cache key.
+
+    Case and runs of whitespace are normalised first, so prompts that
+    differ only in those share an entry. The key only needs to identify
+    the prompt, not resist attacks, so a 128-bit BLAKE2b digest is used:
+    it is faster than SHA-256 on hardware without SHA extensions and
+    keeps the cache index small. Digests of recent prompts are memoised,
+    except for long prompts, which would otherwise be held in memory by
+    the memo.
+
+    Parameters
+    ----------
+    prompt : str
+        The prompt to hash.
+
+    Returns
+    -------
+    str
+        The hex digest of the normalised prompt.
+    """
+    if len(prompt) > _HASH_MEMO_MAX_PROMPT:
+        return _hash_prompt(prompt)
+    return _hash_prompt_memoised(prompt)
+
+
+class CachedResponder:
+    """
+    Answer prompts from the response cache, falling back to the model.
+
+    A prompt is looked up by its normalised hash, then, if the semantic
+    tier is enabled, by the similarity of its embedding to those of
+    cached prompts, so that paraphrases are answered without a chat
+    completion. Misses go through the batcher and are cached, with
+    their embedding when there is one.
+
+    Parameters
+    ----------
+    cache : SQLiteCache
+        The cache holding previous responses.
+    openai_service : OpenAIService
+        The service used to embed prompts.
+    batcher : PromptBatcher
+        The batcher used to generate responses on a miss.
+    semantic : bool, optional
+        Whether exact misses are looked up by embedding similarity.
+    """
+
+    def __init__(
+        self,
+        cache: SQLiteCache,
+        openai_service: OpenAIService,
+        batcher: PromptBatcher,
+        semantic: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.cache = cache
+        self.openai_service = openai_service
+        self.batcher = batcher
+        self.semantic = semantic
+
+    async def respond(self, prompt: str) -> str:
+        """
+        Return the response to a prompt.
+
+        Parameters
+        ----------
+        prompt : str
+            The prompt to respond to.
+
+        Returns
+        -------
+        str
+            The cached or newly generated response.
+        """
+        prompt_hash = hash_prompt(prompt)
+        cached_response, embedding = await self._lookup(
+            prompt, prompt_hash
+        )
+        if cached_response:
+            return cached_response
+
+        response = await self.batcher.process(prompt)
+        # Correctly access response attributes for Pydantic models
+        text_response = (
+            response.choices[0].message.content.strip()
+            if response.choices
+            else ""
+        )
+        await self.cache.aset(prompt_hash, text_response, embedding)
+        return text_response
+
+    async def respond_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream the response to a prompt as it is generated.
+
+        A cached response is yielded whole. Otherwise the completion is
+        streamed straight from the service, bypassing the batcher, and
+        cached once it has been received in full.
+
+        Parameters
+        ----------
+        prompt : str
+            The prompt to respond to.
+
+        Yields
+        ------
+        str
+            Successive fragments of the response.
+        """
+        prompt_hash = hash_prompt(prompt)
+        cached_response, embedding = await self._lookup(
+            prompt, prompt_hash
+        )
+        if cached_response:
+            yield cached_response
+            return
+
+        fragments: List[str] = []
+        stream = self.openai_service.generate_response_stream(
+            prompt, self.batcher.model, self.batcher.params
+        )
+        async for fragment in stream:
+            fragments.append(fragment)
+            yield fragment
+        text_response = "".join(fragments).strip()
+        await self.cache.aset(prompt_hash, text_response, embedding)
+
+    async def _lookup(
+        self, prompt: str, prompt_hash: str
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Look a prompt up by hash, then by embedding similarity.
+
+        Returns the cached response, if any, and the prompt's embedding,
+        if it was computed, which is reused when the new response is
+        cached.
+        """
+        cached_response = await self.cache.aget(prompt_hash)
+        if cached_response:
+            logging.info(f"Cache hit for prompt: {prompt}")
+            return cached_response, None
+
+        if not self.semantic:
+            logging.info(f"Cache miss for prompt: {prompt}")
+            return None, None
+
+        # A paraphrase of a cached prompt is answered from the cache
+        # too, at the cost of an embeddings call on every exact miss
+        embedding = await self.openai_service.generate_embedding(prompt)
+        if embedding is not None:
+            cached_response = await self.cache.asemantic_get(
+                embedding, SEMANTIC_CACHE_THRESHOLD
+            )
+            if cached_response:
+                logging.info(f"Semantic cache hit for prompt: {prompt}")
+                # Stored under this prompt's own hash too, so repeats of
+                # the paraphrase hit exactly, without another embedding
+                await self.cache.aset(
+                    prompt_hash, cached_response, embedding
+                )
+                return cached_response, embedding
+
+        logging.info(f"Cache miss for prompt: {prompt}")
+        return None, embedding
@@ -1,54 +1,152 @@
 import cherrypy
 import json
 import logging
-import os
 import io
+import os
 import speech_recognition as sr
 from pydub import AudioSegment
 from pydub.exceptions import CouldntDecodeError
-from akande.config import OPENAI_DEFAULT_MODEL
+from typing import Optional
+from akande.batcher import PromptBatcher
+from akande.cache import SQLiteCache
+from akande.config import CACHE_DB_PATH, OPENAI_DEFAULT_MODEL
+from akande.responder import CachedResponder
 from akande.services import OpenAIImpl
 
+# Assets under /static are served by CherryPy's staticdir tool, which
+# sets Content-Type, Content-Length and Last-Modified, answers
+# conditional requests with 304 and confines paths to the directory.
+PUBLIC_DIR = os.path.abspath("public")
+SERVER_CONFIG = {
+    "/static": {
+        "tools.staticdir.on": True,
+        "tools.staticdir.dir": PUBLIC_DIR,
+    },
+}
+
+# Formats tried in turn when an upload's container is not recognised.
+_AUDIO_FORMATS = ["webm", "mp3", "mp4", "ogg", "flac"]
+
+# Leading bytes identifying the containers browsers record to.
+_AUDIO_MAGIC = (
+    (b"\x1aE\xdf\xa3", "webm"),
+    (b"OggS", "ogg"),
+    (b"fLaC", "flac"),
+    (b"ID3", "mp3"),
+    (b"\xff\xfb", "mp3"),
+    (b"\xff\xf3", "mp3"),
+    (b"\xff\xf2", "mp3"),
+)
+
+# Output options making ffmpeg decode straight to 16 kHz mono, in C,
+# instead of pydub converting the full-rate stereo samples afterwards.
+_DOWNMIX_PARAMETERS = ["-ac", "1", "-ar", "16000"]
+
+# Labels the JSON bodies built with json.dumps, which CherryPy would
+# otherwise send as text/html. The encode tool only encodes text/*
+# bodies, so handlers using this return the JSON already encoded.
+_JSON_RESPONSE = cherrypy.tools.response_headers(
+    headers=[("Content-Type", "application/json")]
+)
+
+
+def sniff_audio_format(audio_data):
+    """Return the container format of audio data, or None if unknown."""
+    for magic, audio_format in _AUDIO_MAGIC:
+        if audio_data.startswith(magic):
+            return audio_format
+    # ISO base media files (mp4, m4a) open with a box size then "ftyp"
+    if audio_data[4:8] == b"ftyp":
+        return "mp4"
+    return None
+
 
 class AkandeServer:
-    def __init__(self):
+    def __init__(self, cache: Optional[SQLiteCache] = None):
         self.openai_service = OpenAIImpl()
+        # Questions from concurrent requests arriving within 5 ms of
+        # each other are dispatched together, and duplicates share one
+        # call
+        self.batcher = PromptBatcher(
+            self.openai_service,
+            OPENAI_DEFAULT_MODEL,
+            max_batch_size=8,
+            max_queue_time=0.005,
+        )
+        if cache is None:
+            CACHE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+            cache = SQLiteCache(CACHE_DB_PATH)
+        # Repeated and paraphrased questions are answered from the same
+        # response cache as the voice assistant
+        self.responder = CachedResponder(
+            cache, self.openai_service, self.batcher
+        )
         self.logger = logging.getLogger(__name__)
 
     @cherrypy.expose
     def index(self):
-        return open("./public/index.html")
-
-    @cherrypy.expose
-    def static(self, path):
-        return open(f"./public/{path}")
+        return cherrypy.lib.static.serve_file(
+            os.path.join(PUBLIC_DIR, "index.html"),
+            content_type="text/html",
+        )
 
     @cherrypy.expose
+    @_JSON_RESPONSE
     def process_question(self):
         try:
             request_data = json.loads(cherrypy.request.body.read())
             question = request_data.get("question")
             self.logger.info(f"Received question: {question}")
 
-            response_object = (
-                self.openai_service.generate_response_sync(
-                    question, OPENAI_DEFAULT_MODEL, None
-                )
+            message_content = self.generate_response(question)
+            return json.dumps({"response": message_content}).encode(
+                "utf-8"
             )
-            message_content = response_object.choices[0].message.content
-            return json.dumps({"response": message_content})
 
         except Exception as e:
             self.logger.error(f"Failed to process question: {e}")
-            return json.dumps({"response": "An error occurred"})
+            return json.dumps({"response": "An error occurred"}).encode(
+                "utf-8"
+            )
 
     @cherrypy.expose
     @cherrypy.tools.allow(methods=["POST"])
+    @cherrypy.config(**{"response.stream": True})
+    def process_question_stream(self):
+        body = cherrypy.request.body.read()
+
+        # Server-sent events, relayed as the model generates them, so
+        # the first words arrive long before the full answer is complete
+        cherrypy.response.headers["Content-Type"] = "text/event-stream"
+        cherrypy.response.headers["Cache-Control"] = "no-cache"
+
+        def events():
+            try:
+                # Parsed here so a malformed body is reported as an
+                # error event the client can read, not an HTML 500 page
+                question = json.loads(body).get("question")
+                self.logger.info(f"Received question: {question}")
+                for delta in self.openai_service.stream_sync(
+                    self.responder.respond_stream(question)
+                ):
+                    data = json.dumps({"delta": delta})
+                    yield f"data: {data}\n\n".encode("utf-8")
+            except Exception as e:
+                self.logger.error(f"Failed to stream response: {e}")
+                data = json.dumps({"response": "An error occurred"})
+                yield f"event: error\ndata: {data}\n\n".encode("utf-8")
+            yield b"event: done\ndata: {}\n\n"
+
+        return events()
+
+    @cherrypy.expose
+    @cherrypy.tools.allow(methods=["POST"])
+    @_JSON_RESPONSE
     def process_audio_question(self):
         try:
             audio_data = cherrypy.request.body.read()
-            wav_file_path = self.convert_to_wav(audio_data)
-            processed_result = self.process_audio(wav_file_path)
+            wav_file = self.convert_to_wav(audio_data)
+            processed_result = self.process_audio(wav_file)
 
             question_data = {
                 "response": "Audio data processed successfully",
@@ -56,19 +154,11 @@ class AkandeServer:
             }
 
             question = question_data.get("result").get("text")
-            response_object = (
-                self.openai_service.generate_response_sync(
-                    question, OPENAI_DEFAULT_MODEL, None
-                )
+            message_content = self.generate_response(question)
+            return json.dumps({"response": message_content}).encode(
+                "utf-8"
             )
 
-            if os.path.exists(wav_file_path):
-                os.remove(wav_file_path)
-                self.logger.info(f"WAV file removed: {wav_file_path}")
-
-            message_content = response_object.choices[0].message.content
-            return json.dumps({"response": message_content})
-
         except Exception as e:
             self.logger.error("Failed to process audio:", exc_info=True)
             cherrypy.response.status = 500
@@ -76,13 +166,29 @@ class AkandeServer:
                 {"error": "Failed to process audio", "details": str(e)}
             ).encode("utf-8")
 
+    def generate_response(self, question):
+        response = self.openai_service.run_sync(
+            self.responder.respond(question)
+        )
+        self.logger.info(f"Generated response: {response}")
+        return response
+
     @staticmethod
     def convert_to_wav(audio_data):
         try:
-            for input_format in ["webm", "mp3", "mp4", "ogg", "flac"]:
+            # Decoding spawns ffmpeg, so the container is identified
+            # from its leading bytes and decoded once. Trial decoding
+            # remains as a fallback for anything not recognised.
+            sniffed_format = sniff_audio_format(audio_data)
+            input_formats = (
+                [sniffed_format] if sniffed_format else _AUDIO_FORMATS
+            )
+            for input_format in input_formats:
                 try:
                     audio_segment = AudioSegment.from_file(
-                        io.BytesIO(audio_data), format=input_format
+                        io.BytesIO(audio_data),
+                        format=input_format,
+                        parameters=_DOWNMIX_PARAMETERS,
                     )
                     break
                 except CouldntDecodeError:
@@ -91,23 +197,25 @@ class AkandeServer:
             else:
                 raise ValueError("Unsupported audio format")
 
+            # No-ops once ffmpeg has downmixed and resampled the audio
             audio_segment = audio_segment.set_channels(
                 1
             ).set_frame_rate(16000)
-            directory_path = "./"
-            filename = "audio.wav"
-            file_path = os.path.join(directory_path, filename)
-            audio_segment.export(file_path, format="wav")
-            return file_path
+            # Kept in memory: no disk round trip, and concurrent
+            # requests no longer share (and clobber) one ./audio.wav
+            wav_file = io.BytesIO()
+            audio_segment.export(wav_file, format="wav")
+            wav_file.seek(0)
+            return wav_file
 
         except Exception as e:
             raise RuntimeError(f"Error converting audio: {e}")
 
     @staticmethod
-    def process_audio(file_path):
+    def process_audio(wav_file):
         try:
             recognizer = sr.Recognizer()
-            with sr.AudioFile(file_path) as source:
+            with sr.AudioFile(wav_file) as source:
                 audio_data = recognizer.record(source)
 
             text = recognizer.recognize_google(audio_data)
@@ -128,7 +236,7 @@ class AkandeServer:
 def main():
     logging.basicConfig(level=logging.INFO)
     cherrypy.config.update({"server.socket_port": 8080})
-    cherrypy.quickstart(AkandeServer())
+    cherrypy.quickstart(AkandeServer(), config=SERVER_CONFIG)
 
 
 if __name__ == "__main__":
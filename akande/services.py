@@ -15,10 +15,76 @@
 #
 from abc import ABC
 import asyncio
+import importlib.util
 import logging
-from typing import Any, Dict
+import textwrap
+import threading
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+import httpx
 import openai
-from .config import OPENAI_API_KEY, OPENAI_DEFAULT_MODEL
+from .config import (
+    API_CALL_TIMEOUT,
+    OPENAI_API_KEY,
+    OPENAI_DEFAULT_MODEL,
+    OPENAI_EMBEDDING_DIMENSIONS,
+    OPENAI_EMBEDDING_MODEL,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_MAX_CONCURRENT,
+    OPENAI_MAX_RETRIES,
+    OPENAI_RATE_LIMIT_RPM,
+    OPENAI_RATE_LIMIT_TPM,
+    OPENAI_TARGET_LATENCY,
+)
+from .ratelimit import AIMDLimiter, RateLimiter
+
+T = TypeVar("T")
+
+# httpx speaks HTTP/2 only when the optional h2 package is installed
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+# Pre-prompt text to guide the AI's response
+_PRE_PROMPT = textwrap.dedent(
+    """
+    As "Àkàndé," an AI assistant, your mission is to support users by
+    providing accurate information on various topics, condensed into a
+    concise yet comprehensive briefing. Respond only in grammatically
+    correct British English using proper spelling and local terminology.
+
+    Adhere to a 150-word structure:
+
+    Overview
+    - Briefly introduce the topic and frame the key question(s) to be
+    addressed, highlighting relevance to the user.
+
+    Solution
+    - Offer an actionable response using bullet points for clarity.
+    - Outline technical solutions or conceptual recommendations.
+
+    Conclusion
+    - Concisely summarize 2-3 most important conclusions or next steps
+    for the user.
+
+    Recommendations
+    - Provide helpful recommendations based on the information presented.
+
+    Use straightforward language suitable for a middle-school audience.
+    Avoid profanity or potentially insensitive language. Focus on
+    delivering value by prioritizing essential information relevant to the
+    user's needs within 150 words.
+    """
+).strip()
 
 
 class OpenAIService(ABC):
@@ -29,12 +95,59 @@ class OpenAIService(ABC):
     ) -> Dict[str, Any]:
         pass
 
+    async def generate_embedding(
+        self, text: str
+    ) -> Optional[List[float]]:
+        pass
+
+    def generate_response_stream(
+        self, prompt: str, model: str, params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        pass
+
 
 class OpenAIImpl(OpenAIService):
     """OpenAI API client implementation."""
 
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, max_concurrent: int = OPENAI_MAX_CONCURRENT):
+        timeout = httpx.Timeout(
+            API_CALL_TIMEOUT, connect=5.0, write=10.0, pool=5.0
+        )
+        # httpx closes idle connections after 5 s by default, shorter
+        # than the pause between spoken turns, so every question paid
+        # for a fresh TCP and TLS handshake.
+        # Over HTTP/2, concurrent requests share one multiplexed
+        # connection instead of opening a socket each.
+        http_client = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
+        # A single async client multiplexes every request over one HTTP
+        # connection pool instead of parking a worker thread per call.
+        # Retries use the SDK's exponential backoff with jitter, which
+        # also honours the Retry-After header on rate-limit responses.
+        self.client = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=OPENAI_MAX_RETRIES,
+            timeout=timeout,
+            http_client=http_client,
+        )
+        self._concurrency = AIMDLimiter(
+            max_concurrent,
+            maximum=max_concurrent * 4,
+            target_latency=OPENAI_TARGET_LATENCY,
+        )
+        self._limiter = RateLimiter(
+            OPENAI_RATE_LIMIT_RPM, OPENAI_RATE_LIMIT_TPM
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
 
     async def generate_response(
         self,
@@ -45,59 +158,227 @@ class OpenAIImpl(OpenAIService):
         if not params:
             params = {}
 
-        # Pre-prompt text to guide the AI's response
-        pre_prompt = """
-        As "Àkàndé," an AI assistant, your mission is to support users by
-        providing accurate information on various topics, condensed into a
-        concise yet comprehensive briefing. Respond only in grammatically
-        correct British English using proper spelling and local terminology.
+        try:
+            return await self._create_completion(
+                model=model,
+                messages=self._build_messages(user_prompt),
+                **params,
+            )
+        except openai.APITimeoutError:
+            logging.error(
+                "OpenAI API call timed out after %s seconds",
+                API_CALL_TIMEOUT,
+            )
+            return {"error": "OpenAI API call timed out"}
+        except Exception as exc:
+            logging.error("OpenAI API error: %s", exc)
+            return {"error": str(exc)}
 
-        Adhere to a 150-word structure:
+    async def generate_response_stream(
+        self,
+        user_prompt: str,
+        model: str = OPENAI_DEFAULT_MODEL,
+        params: Dict[str, Any] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding text as it is generated.
+
+        The request goes through the same admission controls as
+        generate_response. API errors are raised to the caller.
 
-        Overview
-        - Briefly introduce the topic and frame the key question(s) to be
-        addressed, highlighting relevance to the user.
+        Args:
+            user_prompt (str): The user's question.
+            model (str): The chat model to use.
+            params (dict): Extra parameters for the completion request.
 
-        Solution
-        - Offer an actionable response using bullet points for clarity.
-        - Outline technical solutions or conceptual recommendations.
+        Yields:
+            str: Successive fragments of the response.
+        """
+        completions = self.client.chat.completions.with_raw_response
+        await self._limiter.acquire()
+        await self._concurrency.acquire()
+        start = time.monotonic()
+        overloaded = False
+        characters = len(_PRE_PROMPT) + len(user_prompt)
+        try:
+            raw_response = await completions.create(
+                model=model,
+                messages=self._build_messages(user_prompt),
+                stream=True,
+                **(params or {}),
+            )
+            self._limiter.update_from_headers(raw_response.headers)
+            async for chunk in raw_response.parse():
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    characters += len(delta)
+                    yield delta
+        except openai.APIStatusError as exc:
+            status = exc.status_code
+            overloaded = status == 429 or status >= 500
+            raise
+        except openai.APITimeoutError:
+            overloaded = True
+            raise
+        finally:
+            await self._concurrency.release(
+                time.monotonic() - start, overloaded
+            )
+            # Streamed responses carry no usage, so tokens are estimated
+            # at the usual four characters per token
+            self._limiter.record_tokens(characters // 4)
 
-        Conclusion
-        - Concisely summarize 2-3 most important conclusions or next steps
-        for the user.
+    @staticmethod
+    def _build_messages(user_prompt: str) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a user prompt.
 
-        Recommendations
-        - Provide helpful recommendations based on the information presented.
+        The fixed pre-prompt goes first, as a system message, so that its
+        token prefix is identical across calls and eligible for OpenAI's
+        automatic prompt caching.
+        """
+        return [
+            {"role": "system", "content": _PRE_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        Use straightforward language suitable for a middle-school audience.
-        Avoid profanity or potentially insensitive language. Focus on
-        delivering value by prioritizing essential information relevant to the
-        user's needs within 150 words.
+    async def generate_embedding(
+        self, text: str
+    ) -> Optional[List[float]]:
         """
+        Embed text for the semantic response cache.
 
-        # Combine the pre-prompt with the user's prompt
-        full_prompt = pre_prompt + "\n" + user_prompt
+        Args:
+            text (str): The text to embed.
 
+        Returns:
+            Optional[List[float]]: A unit-length vector, or None if the
+            API call failed.
+        """
         try:
-            # Specify the correct method for chat completions
-            loop = asyncio.get_running_loop()
-            response = await loop.run_in_executor(
-                None,  # Uses default executor
-                lambda: self.client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": full_prompt}],
-                    **params,
-                ),
+            response = await self._admitted(
+                self.client.embeddings.with_raw_response.create,
+                model=OPENAI_EMBEDDING_MODEL,
+                input=text,
+                dimensions=OPENAI_EMBEDDING_DIMENSIONS,
             )
-            return response
         except Exception as exc:
-            logging.error("OpenAI API error: %s", exc)
-            return {"error": str(exc)}
+            logging.error("OpenAI embedding error: %s", exc)
+            return None
+        return response.data[0].embedding
+
+    async def _create_completion(self, **kwargs: Any) -> Any:
+        """Send a chat completion request through admission control."""
+        return await self._admitted(
+            self.client.chat.completions.with_raw_response.create,
+            **kwargs,
+        )
+
+    async def _admitted(
+        self, create: Callable[..., Awaitable[Any]], **kwargs: Any
+    ) -> Any:
+        """
+        Send an API request through the admission controls.
+
+        The request waits for the rate limiter and a concurrency permit,
+        then feeds its latency, the provider's rate-limit headers and
+        its token usage back into both limiters.
+
+        Args:
+            create (Callable): The ``with_raw_response`` create method
+            to call.
+            **kwargs: The arguments of the request.
+
+        Returns:
+            Any: The parsed response.
+        """
+        await self._limiter.acquire()
+        await self._concurrency.acquire()
+        start = time.monotonic()
+        overloaded = False
+        try:
+            raw_response = await create(**kwargs)
+        except openai.APIStatusError as exc:
+            status = exc.status_code
+            overloaded = status == 429 or status >= 500
+            raise
+        except openai.APITimeoutError:
+            overloaded = True
+            raise
+        finally:
+            await self._concurrency.release(
+                time.monotonic() - start, overloaded
+            )
+        self._limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        if response.usage:
+            self._limiter.record_tokens(response.usage.total_tokens)
+        return response
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Return the background event loop used by synchronous callers.
+
+        The async client's connection pool is bound to the loop that
+        opened it, so synchronous callers (e.g. CherryPy worker threads)
+        share one long-lived loop instead of creating one per request.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="akande-openai",
+                    daemon=True,
+                ).start()
+            return self._loop
+
+    def run_sync(self, coro: Awaitable[T]) -> T:
+        """
+        Run a coroutine on the background event loop and wait for it.
+
+        Args:
+            coro (Awaitable[T]): The coroutine to run.
+
+        Returns:
+            T: The coroutine's result.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            coro, self._get_loop()
+        ).result()
+
+    def stream_sync(self, stream: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Iterate over an async iterator from synchronous code.
+
+        Each item is produced on the background event loop, so
+        synchronous callers can relay a stream as it arrives.
+
+        Args:
+            stream (AsyncIterator[T]): The async iterator to consume.
+
+        Yields:
+            T: The iterator's items.
+        """
+        loop = self._get_loop()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(
+                        stream.__anext__(), loop
+                    ).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Release the request's permits if the caller stops early
+            asyncio.run_coroutine_threadsafe(
+                stream.aclose(), loop
+            ).result()
 
     def generate_response_sync(
         self, user_prompt, model=OPENAI_DEFAULT_MODEL, params=None
     ):
-        response = asyncio.run(
+        response = self.run_sync(
             self.generate_response(user_prompt, model, params)
         )
         logging.info(f"Generated response: {response}")
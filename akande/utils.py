@@ -25,10 +25,96 @@ from reportlab.platypus import (
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT
 from pathlib import Path
+import asyncio
 import datetime
+import functools
+import io
 import logging
 import re
 
+# Paragraph styles for generated PDFs, built once at import time. Each
+# derives from a pristine sample style sheet rather than mutating one.
+_SAMPLE_STYLES = getSampleStyleSheet()
+
+# Custom style for list items
+_LIST_ITEM_STYLE = ParagraphStyle(
+    "listItem",
+    parent=_SAMPLE_STYLES["BodyText"],
+    fontSize=12,
+    leading=14,
+    spaceBefore=0,
+    spaceAfter=6,
+    leftIndent=10,
+    firstLineIndent=-10,
+)
+
+_HEADING1_STYLE = ParagraphStyle(
+    "akandeHeading1",
+    parent=_SAMPLE_STYLES["Heading1"],
+    fontName="Helvetica-Bold",
+    fontSize=14,
+    leading=16,
+    alignment=TA_LEFT,
+)
+
+_HEADING2_STYLE = ParagraphStyle(
+    "akandeHeading2",
+    parent=_SAMPLE_STYLES["Heading2"],
+    fontName="Helvetica-Bold",
+    fontSize=12,
+    leading=14,
+    alignment=TA_LEFT,
+)
+
+_BODY_STYLE = ParagraphStyle(
+    "akandeBodyText",
+    parent=_SAMPLE_STYLES["BodyText"],
+    fontName="Helvetica",
+    fontSize=12,
+    leading=14,
+    alignment=TA_LEFT,
+)
+
+# Logo placed at the top of generated PDFs, if present
+_LOGO_PATH = "./512x512.png"
+
+# Response lines that open a section and are rendered as subheadings
+_SECTION_HEADINGS = (
+    "Overview",
+    "Solution",
+    "Conclusion",
+    "Recommendations",
+)
+
+# Response lines starting with a digit, optionally after a dash, are
+# rendered as list items
+_LIST_ITEM = re.compile(r"-?\d")
+
+
+@functools.lru_cache(maxsize=1)
+def _read_logo() -> Optional[bytes]:
+    """Read the PDF logo once, returning None if there is none."""
+    try:
+        return Path(_LOGO_PATH).read_bytes()
+    except OSError:
+        logging.warning(f"No logo found at {_LOGO_PATH}.")
+        return None
+
+
+def _output_path(now: datetime.datetime, suffix: str) -> Path:
+    """
+    Return the path of a document generated at the given time.
+
+    The dated directory and the timestamped file name are formatted from
+    the same instant, so they agree even across midnight. The directory
+    is created if needed.
+    """
+    directory_path = Path(now.strftime("%Y-%m-%d"))
+    directory_path.mkdir(parents=True, exist_ok=True)
+    return directory_path / (
+        now.strftime("%Y-%m-%d-%H-%M-Akande") + suffix
+    )
+
 
 def validate_api_key(api_key: Optional[str]) -> bool:
     """
@@ -80,91 +166,47 @@ async def generate_pdf(question: str, response: str) -> None:
     named "512x512.png" is present in the current directory.
     """
     # Setup directory and file path for the PDF
-    date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    directory_path = Path(date_str)
-    directory_path.mkdir(parents=True, exist_ok=True)
-    filename = (
-        datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-Akande")
-        + ".pdf"
-    )
-    file_path = directory_path / filename
+    file_path = _output_path(datetime.datetime.now(), ".pdf")
 
     # Initialize the document
     doc = SimpleDocTemplate(str(file_path), pagesize=letter)
-    styles = getSampleStyleSheet()
 
     flowables = []
 
     # Optional: Add a logo at the top
-    logo_path = "./512x512.png"  # Adjust the path to your logo
-    logo = Image(logo_path, width=48, height=48)
-    logo.hAlign = "RIGHT"
-    logo.preserveAspectRatio = True
-    flowables.append(logo)
-    flowables.append(Spacer(1, 12))
-
-    # Custom style for list items
-    list_item_style = ParagraphStyle(
-        "listItem",
-        parent=styles["BodyText"],
-        fontSize=12,
-        leading=14,
-        spaceBefore=0,
-        spaceAfter=6,
-        leftIndent=10,
-        firstLineIndent=-10,
-    )
-
-    # Get the sample style sheet and modify the Heading1 style
-    styles = getSampleStyleSheet()
-    heading1Style = styles["Heading1"]
-    heading1Style.fontName = "Helvetica-Bold"  # Set to a bold font
-    heading1Style.fontSize = 14
-    heading1Style.leading = 16
-    heading1Style.alignment = TA_LEFT  # Set text alignment if needed
-
-    styles = getSampleStyleSheet()
-    heading2Style = styles["Heading2"]
-    heading2Style.fontName = "Helvetica-Bold"
-    heading2Style.fontSize = 12
-    heading2Style.leading = 14
-    heading2Style.alignment = TA_LEFT  # Set text alignment if needed
-
-    styles = getSampleStyleSheet()
-    paragraphStyle = styles["BodyText"]
-    paragraphStyle.fontName = "Helvetica"
-    paragraphStyle.fontSize = 12
-    paragraphStyle.leading = 14
-    paragraphStyle.alignment = TA_LEFT  # Set text alignment if needed
+    logo_bytes = _read_logo()
+    if logo_bytes is not None:
+        logo = Image(io.BytesIO(logo_bytes), width=48, height=48)
+        logo.hAlign = "RIGHT"
+        logo.preserveAspectRatio = True
+        flowables.append(logo)
+        flowables.append(Spacer(1, 12))
 
     # When adding the question as a header, make sure it's uppercase
-    flowables.append(Paragraph(question.title(), heading1Style))
+    flowables.append(Paragraph(question.title(), _HEADING1_STYLE))
     flowables.append(Spacer(1, 6))
 
     # Process and format the response content
     paragraphs = response.split("\n")
     for para in paragraphs:
-        if para.startswith(
-            (
-                "Overview",
-                "Solution",
-                "Conclusion",
-                "Recommendations",
-            )
-        ):
-            flowables.append(Paragraph(para, heading2Style))
+        if para.startswith(_SECTION_HEADINGS):
+            flowables.append(Paragraph(para, _HEADING2_STYLE))
             flowables.append(Spacer(1, 6))
-        elif re.match(r"^-?\d", para):
+        elif _LIST_ITEM.match(para):
             formatted_text = (
                 "- " + para if not para.startswith("-") else para
             )
-            flowables.append(Paragraph(formatted_text, list_item_style))
+            flowables.append(
+                Paragraph(formatted_text, _LIST_ITEM_STYLE)
+            )
             flowables.append(Spacer(1, 6))
         else:
-            flowables.append(Paragraph(para, paragraphStyle))
+            flowables.append(Paragraph(para, _BODY_STYLE))
             flowables.append(Spacer(1, 6))
 
-    doc.build(flowables)
+    # Rendering is CPU-bound, so keep it off the event loop
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, doc.build, flowables)
     logging.info(f"PDF file generated: {file_path}")
 
 
@@ -191,27 +233,27 @@ async def generate_csv(question: str, response: str) -> None:
     within the current working directory.
     The directory and file names are based on the current date and time.
     """
-    # Create a directory path with the current date
-    date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    directory_path = Path(date_str)
-    # Ensure the directory exists
-    directory_path.mkdir(parents=True, exist_ok=True)
+    # Create the CSV path in a directory named with the current date
+    file_path = _output_path(datetime.datetime.now(), ".csv")
+
+    # Compose the CSV in memory so only the write leaves the event loop
+    buffer = io.StringIO()
+    csv_writer = csv.writer(buffer)
+    # Write the headers
+    csv_writer.writerow(["Question", "Response"])
+    # Write the question and response
+    csv_writer.writerow([question, response])
 
-    # Create the CSV filename with timestamp
-    filename = (
-        datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-Akande")
-        + ".csv"
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, _write_text, file_path, buffer.getvalue()
     )
-    file_path = directory_path / filename
+    logging.info(f"CSV file generated: {file_path}")
+
 
-    # Open the file in write mode
+def _write_text(file_path: Path, text: str) -> None:
+    """Write text to a file as UTF-8, without newline translation."""
     with open(
         file_path, mode="w", newline="", encoding="utf-8"
     ) as file:
-        csv_writer = csv.writer(file)
-        # Write the headers
-        csv_writer.writerow(["Question", "Response"])
-        # Write the question and response
-        csv_writer.writerow([question, response])
-
-    logging.info(f"CSV file generated: {file_path}")
+        file.write(text)
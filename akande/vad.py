@@ -0,0 +1,67 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import audioop
+
+# Length of the frames whose energy is measured, in seconds.
+FRAME_DURATION = 0.01
+
+# Frames above the energy threshold needed to count as speech, so that
+# clicks and short bursts of noise are rejected (100 ms of audio).
+MIN_SPEECH_FRAMES = 10
+
+
+def contains_speech(
+    frame_data: bytes,
+    sample_rate: int,
+    sample_width: int,
+    energy_threshold: float,
+    min_speech_frames: int = MIN_SPEECH_FRAMES,
+) -> bool:
+    """
+    Tell whether recorded audio holds enough voiced frames to be speech.
+
+    The RMS energy of each 10 ms frame is computed by ``audioop``, in C,
+    and compared with the threshold; the scan stops as soon as enough
+    frames are voiced.
+
+    Parameters
+    ----------
+    frame_data : bytes
+        Raw little-endian PCM samples, mono.
+    sample_rate : int
+        The number of samples per second.
+    sample_width : int
+        The number of bytes per sample.
+    energy_threshold : float
+        The RMS energy above which a frame is considered voiced.
+    min_speech_frames : int, optional
+        The number of voiced frames needed to report speech.
+
+    Returns
+    -------
+    bool
+        Whether at least ``min_speech_frames`` frames are voiced.
+    """
+    frame_samples = max(int(sample_rate * FRAME_DURATION), 1)
+    frame_size = frame_samples * sample_width
+    voiced = 0
+    for start in range(0, len(frame_data) - frame_size + 1, frame_size):
+        frame = frame_data[start : start + frame_size]
+        if audioop.rms(frame, sample_width) > energy_threshold:
+            voiced += 1
+            if voiced >= min_speech_frames:
+                return True
+    return False
@@ -0,0 +1,96 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+
+from akande.batcher import PromptBatcher
+
+
+class FakeService:
+    """Answers each prompt with itself upper-cased, recording calls."""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    async def generate_response(self, prompt, model, params=None):
+        self.calls.append(prompt)
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return prompt.upper()
+
+
+def test_identical_prompts_share_one_call():
+    service = FakeService()
+    batcher = PromptBatcher(service, "model", max_queue_time=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.process("a"),
+            batcher.process("b"),
+            batcher.process("a"),
+        )
+
+    assert asyncio.run(run()) == ["A", "B", "A"]
+    assert service.calls == ["a", "b"]
+
+
+def test_full_batch_is_dispatched_without_waiting():
+    service = FakeService()
+    batcher = PromptBatcher(
+        service, "model", max_batch_size=2, max_queue_time=60.0
+    )
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.process("a"), batcher.process("b")),
+            1.0,
+        )
+
+    assert asyncio.run(run()) == ["A", "B"]
+
+
+def test_batch_of_one_is_dispatched_at_once():
+    service = FakeService()
+    batcher = PromptBatcher(
+        service, "model", max_batch_size=1, max_queue_time=60.0
+    )
+
+    async def run():
+        first = await asyncio.wait_for(batcher.process("a"), 1.0)
+        second = await asyncio.wait_for(batcher.process("a"), 1.0)
+        return first, second
+
+    assert asyncio.run(run()) == ("A", "A")
+    # Nothing to coalesce with, so each prompt gets its own call
+    assert service.calls == ["a", "a"]
+
+
+def test_errors_reach_every_waiter():
+    service = FakeService(error=RuntimeError("boom"))
+    batcher = PromptBatcher(service, "model", max_queue_time=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.process("a"),
+            batcher.process("a"),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert service.calls == ["a"]
+    assert len(results) == 2
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,122 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import math
+import sqlite3
+
+import pytest
+
+from akande.cache import SQLiteCache
+
+
+def stored(db_path, table="cache"):
+    """Return the prompt hashes held in a table, read from SQLite."""
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(f"SELECT prompt_hash FROM {table}")
+        return sorted(row[0] for row in rows)
+
+
+def unit(*values):
+    """Scale a vector to unit length."""
+    norm = math.sqrt(sum(v * v for v in values))
+    return [v / norm for v in values]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_get_returns_what_set_stored(db_path):
+    cache = SQLiteCache(db_path)
+    cache.set("a", "answer")
+    assert cache.get("a") == "answer"
+    assert cache.get("b") is None
+    # A second instance reads it back from SQLite, not from memory
+    assert SQLiteCache(db_path).get("a") == "answer"
+
+
+def test_set_replaces_an_existing_response(db_path):
+    cache = SQLiteCache(db_path, max_size=2)
+    cache.set("a", "old")
+    cache.set("a", "new")
+    cache.set("b", "other")
+    assert SQLiteCache(db_path).get("a") == "new"
+    assert stored(db_path) == ["a", "b"]
+
+
+def test_eviction_removes_the_least_recently_used(db_path):
+    cache = SQLiteCache(db_path, max_size=3)
+    for prompt_hash in ("a", "b", "c"):
+        cache.set(prompt_hash, prompt_hash)
+    # last_access has one-second resolution, so age the rows instead of
+    # sleeping between writes
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "UPDATE cache SET last_access = datetime('now', '-1 hour')"
+        )
+    # Reading "a" protects it, leaving "b" as the oldest access
+    assert cache.get("a") == "a"
+    cache.set("d", "d")
+    assert stored(db_path) == ["a", "c", "d"]
+
+
+def test_eviction_takes_embeddings_with_it(db_path):
+    cache = SQLiteCache(db_path, max_size=1)
+    cache.set("a", "first", unit(1.0, 0.0))
+    cache.set("b", "second", unit(0.0, 1.0))
+    assert stored(db_path) == ["b"]
+    assert stored(db_path, "cache_vec") == ["b"]
+
+
+def test_instances_sharing_a_database_keep_it_bounded(db_path):
+    first = SQLiteCache(db_path, max_size=5)
+    second = SQLiteCache(db_path, max_size=5)
+    for i in range(12):
+        (first if i % 2 else second).set(str(i), str(i))
+    assert len(stored(db_path)) == 5
+
+
+def test_semantic_get_honours_the_threshold(db_path):
+    cache = SQLiteCache(db_path)
+    cache.set("a", "answer", unit(1.0, 0.0, 0.0))
+    # Cosine similarity 0.96 with the cached prompt
+    query = unit(0.96, 0.28, 0.0)
+    assert cache.semantic_get(query, 0.95) == "answer"
+    assert cache.semantic_get(query, 0.97) is None
+
+
+def test_semantic_get_picks_the_closest_prompt(db_path):
+    cache = SQLiteCache(db_path)
+    cache.set("a", "far", unit(1.0, 1.0, 0.0))
+    cache.set("b", "near", unit(1.0, 0.1, 0.0))
+    cache.set("c", "no vector")
+    assert cache.semantic_get(unit(1.0, 0.0, 0.0), 0.5) == "near"
+    # Vectors of another size are skipped rather than compared
+    assert cache.semantic_get(unit(1.0, 0.0), 0.5) is None
+
+
+def test_async_wrappers(db_path):
+    cache = SQLiteCache(db_path)
+
+    async def run():
+        await cache.aset("a", "answer", unit(0.0, 1.0))
+        return (
+            await cache.aget("a"),
+            await cache.asemantic_get(unit(0.0, 1.0), 0.9),
+        )
+
+    assert asyncio.run(run()) == ("answer", "answer")
@@ -0,0 +1,155 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import time
+
+import pytest
+
+from akande.ratelimit import AIMDLimiter, RateLimiter, parse_duration
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [
+        ("6m0s", 360.0),
+        ("1.5s", 1.5),
+        ("20ms", 0.02),
+        ("1h2m3s", 3723.0),
+        ("", 0.0),
+        ("soon", 0.0),
+    ],
+)
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_rate_limiter_admits_a_burst_then_paces():
+    # 600 requests per minute: a bucket of 10, refilled every 0.1 s
+    limiter = RateLimiter(600, 10**9)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(10):
+            await limiter.acquire()
+        burst = time.monotonic() - start
+        for _ in range(5):
+            await limiter.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.05
+    assert 0.4 <= total < 1.0
+
+
+def test_rate_limiter_waits_for_the_token_window():
+    limiter = RateLimiter(6000, 100, window=0.3)
+
+    async def run():
+        await limiter.acquire()
+        limiter.record_tokens(100)
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_rate_limiter_spaces_requests_near_the_provider_limit():
+    limiter = RateLimiter(6000, 10**9)
+    limiter.update_from_headers(
+        {
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "1",
+            "x-ratelimit-reset-requests": "300ms",
+        }
+    )
+
+    async def run():
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_rate_limiter_ignores_headers_with_budget_left():
+    limiter = RateLimiter(6000, 10**9)
+    limiter.update_from_headers(
+        {
+            "x-ratelimit-limit-requests": "100",
+            "x-ratelimit-remaining-requests": "50",
+            "x-ratelimit-reset-requests": "1m0s",
+        }
+    )
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "oops"})
+
+    async def run():
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_aimd_increases_additively_on_healthy_latency():
+    limiter = AIMDLimiter(4, target_latency=1.0, increase=0.5)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(0.1, overloaded=False)
+
+    asyncio.run(run())
+    assert limiter.limit == pytest.approx(6.0)
+
+
+def test_aimd_decreases_multiplicatively_on_overload():
+    limiter = AIMDLimiter(8, minimum=2, decrease=0.5)
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release(0.1, overloaded=True)
+
+    asyncio.run(run())
+    # 8 -> 4 -> 2, then held at the floor
+    assert limiter.limit == pytest.approx(2.0)
+
+
+def test_aimd_decreases_when_mean_latency_exceeds_target():
+    limiter = AIMDLimiter(8, target_latency=1.0)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.release(5.0, overloaded=False)
+
+    asyncio.run(run())
+    assert limiter.limit == pytest.approx(4.0)
+
+
+def test_aimd_caps_permits_in_flight():
+    limiter = AIMDLimiter(1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.05)
+        blocked = not waiter.done()
+        await limiter.release(0.1, overloaded=False)
+        await asyncio.wait_for(waiter, 1.0)
+        return blocked
+
+    assert asyncio.run(run())
@@ -0,0 +1,120 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from types import SimpleNamespace
+import asyncio
+import math
+
+import pytest
+
+from akande.batcher import PromptBatcher
+from akande.cache import SQLiteCache
+from akande.config import SEMANTIC_CACHE_THRESHOLD
+from akande.responder import CachedResponder, hash_prompt
+
+
+def at_similarity(cosine):
+    """Return a unit vector at the given cosine to (1, 0)."""
+    return [cosine, math.sqrt(1.0 - cosine * cosine)]
+
+
+class FakeService:
+    """Embeds prompts from a fixed table and answers with a counter."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.embedded = []
+        self.completions = 0
+
+    async def generate_embedding(self, text):
+        self.embedded.append(text)
+        return self.embeddings.get(text)
+
+    async def generate_response(self, prompt, model, params=None):
+        self.completions += 1
+        content = f" answer {self.completions} "
+        message = SimpleNamespace(content=content)
+        choice = SimpleNamespace(message=message)
+        return SimpleNamespace(choices=[choice])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.db"))
+
+
+def responder(cache, service, semantic):
+    batcher = PromptBatcher(service, "model", max_batch_size=1)
+    return CachedResponder(cache, service, batcher, semantic=semantic)
+
+
+def test_exact_repeats_are_answered_from_the_cache(cache):
+    service = FakeService({})
+    answer = responder(cache, service, semantic=False)
+
+    async def run():
+        return (
+            await answer.respond("What is AIMD?"),
+            await answer.respond("  what is   aimd?"),
+        )
+
+    assert asyncio.run(run()) == ("answer 1", "answer 1")
+    assert service.completions == 1
+
+
+def test_semantic_tier_is_skipped_when_disabled(cache):
+    service = FakeService({"q": at_similarity(1.0)})
+    answer = responder(cache, service, semantic=False)
+    asyncio.run(answer.respond("q"))
+    assert service.embedded == []
+
+
+def test_paraphrase_is_answered_and_stored_under_its_own_hash(cache):
+    service = FakeService(
+        {
+            "original": at_similarity(1.0),
+            "paraphrase": at_similarity(0.98),
+        }
+    )
+    answer = responder(cache, service, semantic=True)
+
+    async def run():
+        await answer.respond("original")
+        return await answer.respond("paraphrase")
+
+    assert asyncio.run(run()) == "answer 1"
+    assert service.completions == 1
+    assert cache.get(hash_prompt("paraphrase")) == "answer 1"
+
+
+def test_related_question_is_not_a_match_at_the_default_threshold(
+    cache,
+):
+    # Related but different questions often score around 0.9
+    service = FakeService(
+        {
+            "original": at_similarity(1.0),
+            "related": at_similarity(0.9),
+        }
+    )
+    answer = responder(cache, service, semantic=True)
+
+    async def run():
+        await answer.respond("original")
+        return await answer.respond("related")
+
+    assert SEMANTIC_CACHE_THRESHOLD > 0.9
+    assert asyncio.run(run()) == "answer 2"
+    assert service.completions == 2
@@ -0,0 +1,38 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+pytest.importorskip("cherrypy")
+pytest.importorskip("pydub")
+
+from akande.server.server import sniff_audio_format  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "audio_data, audio_format",
+    [
+        (b"\x1aE\xdf\xa3\x9fB\x86\x81", "webm"),
+        (b"OggS\x00\x02", "ogg"),
+        (b"fLaC\x00\x00\x00\x22", "flac"),
+        (b"ID3\x04\x00", "mp3"),
+        (b"\xff\xfb\x90\x64", "mp3"),
+        (b"\x00\x00\x00\x20ftypM4A ", "mp4"),
+        (b"RIFF\x24\x00\x00\x00WAVE", None),
+        (b"", None),
+    ],
+)
+def test_sniff_audio_format(audio_data, audio_format):
+    assert sniff_audio_format(audio_data) == audio_format
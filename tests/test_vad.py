@@ -0,0 +1,71 @@
+# Copyright (C) 2024 Sebastien Rousseau.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from array import array
+import math
+import sys
+
+import pytest
+
+pytest.importorskip("audioop")
+
+from akande.vad import contains_speech  # noqa: E402
+
+SAMPLE_RATE = 16000
+THRESHOLD = 300
+
+
+def tone(seconds, amplitude=10000, frequency=440):
+    """Return 16-bit mono PCM samples of a sine wave."""
+    step = 2 * math.pi * frequency / SAMPLE_RATE
+    samples = array(
+        "h",
+        (
+            int(amplitude * math.sin(step * i))
+            for i in range(int(seconds * SAMPLE_RATE))
+        ),
+    )
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def silence(seconds):
+    """Return 16-bit mono PCM silence."""
+    return bytes(2 * int(seconds * SAMPLE_RATE))
+
+
+def test_tone_is_speech():
+    assert contains_speech(tone(0.5), SAMPLE_RATE, 2, THRESHOLD)
+
+
+def test_silence_is_not_speech():
+    assert not contains_speech(silence(0.5), SAMPLE_RATE, 2, THRESHOLD)
+
+
+def test_short_burst_is_not_speech():
+    # 50 ms of sound is below the 100 ms needed
+    audio = silence(0.2) + tone(0.05) + silence(0.2)
+    assert not contains_speech(audio, SAMPLE_RATE, 2, THRESHOLD)
+
+
+def test_quiet_tone_is_not_speech():
+    assert not contains_speech(
+        tone(0.5, amplitude=100), SAMPLE_RATE, 2, THRESHOLD
+    )
+
+
+def test_empty_recording_is_not_speech():
+    assert not contains_speech(b"", SAMPLE_RATE, 2, THRESHOLD)